@@ -1,6 +1,132 @@
+import os
+import weakref
+from collections import OrderedDict
+
 import torch
 import torch.nn.functional as F
 
+
+class _ProcessedFrameCache:
+    """
+    Bounded cache of resized/channel-adapted frames, shared across runs.
+    - Keys combine the source tensor's identity, layout and storage pointer with
+      the frame index and the target (H, W, C), dtype and device.
+    - In-place edits are detected through the version counter for normal tensors.
+      Inference tensors (ComfyUI runs nodes under torch.inference_mode()) don't
+      track one, so their entries are validated on hit against a sum/amax
+      fingerprint of the source frame instead.
+    - Each source is held through a weak reference; when it is garbage collected
+      all of its entries are dropped, so a recycled id() never returns a stale frame.
+    - Once the byte budget is full, only entries not used in the current run are
+      evicted; otherwise new frames are not admitted. A batch larger than the
+      budget thus keeps the prefix that fits instead of thrashing every rerun.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._sources = {}
+        self._run = 0
+
+    @staticmethod
+    def make_key(source, frame_idx, target_h, target_w, target_c, dtype, device):
+        version = None if source.is_inference() else source._version
+        return (
+            id(source), tuple(source.shape), source.stride(), source.data_ptr(), source.dtype, version,
+            frame_idx, target_h, target_w, target_c, dtype, str(device),
+        )
+
+    @staticmethod
+    def fingerprint(source, frame_idx):
+        if not source.is_inference():
+            return None
+        frame = source[frame_idx]
+        return tuple(torch.stack((frame.sum(dtype=torch.float64), frame.amax().double())).tolist())
+
+    def start_run(self):
+        self._run += 1
+
+    def get(self, key, source, fingerprint=None):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        source_ref, frame, entry_fingerprint, _ = entry
+        if source_ref() is not source or entry_fingerprint != fingerprint:
+            self._remove(key)
+            return None
+        self._entries[key] = (source_ref, frame, entry_fingerprint, self._run)
+        self._entries.move_to_end(key)
+        return frame
+
+    def put(self, key, source, frame, fingerprint=None):
+        frame_bytes = frame.numel() * frame.element_size()
+        if key in self._entries:
+            self._remove(key)
+        # Entries used in this run sit at the end, so evict from the front until
+        # the frame fits or only current-run entries remain.
+        while self.current_bytes + frame_bytes > self.max_bytes and self._entries:
+            oldest_key = next(iter(self._entries))
+            if self._entries[oldest_key][3] == self._run:
+                break
+            self._remove(oldest_key)
+        if self.current_bytes + frame_bytes > self.max_bytes:
+            return
+        source_ref, source_keys = self._track_source(source)
+        self._entries[key] = (source_ref, frame, fingerprint, self._run)
+        source_keys.add(key)
+        self.current_bytes += frame_bytes
+
+    def clear(self):
+        self._entries.clear()
+        self._sources.clear()
+        self.current_bytes = 0
+
+    def _track_source(self, source):
+        source_id = id(source)
+        tracked = self._sources.get(source_id)
+        if tracked is not None and tracked[0]() is source:
+            return tracked
+        if tracked is not None:
+            self._purge_source(source_id, tracked[0])
+        source_ref = weakref.ref(source, lambda ref, source_id=source_id: self._purge_source(source_id, ref))
+        tracked = (source_ref, set())
+        self._sources[source_id] = tracked
+        return tracked
+
+    def _purge_source(self, source_id, source_ref):
+        tracked = self._sources.get(source_id)
+        if tracked is None or tracked[0] is not source_ref:
+            return
+        del self._sources[source_id]
+        for key in list(tracked[1]):
+            self._remove(key)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        source_ref, frame, _, _ = entry
+        self.current_bytes -= frame.numel() * frame.element_size()
+        tracked = self._sources.get(key[0])
+        if tracked is not None and tracked[0] is source_ref:
+            tracked[1].discard(key)
+            if not tracked[1]:
+                del self._sources[key[0]]
+
+
+def _frame_cache_budget_bytes(default_mb=256):
+    raw_value = os.environ.get("CODE_NODES_FRAME_CACHE_MB")
+    if raw_value is None:
+        return default_mb * 1024 ** 2
+    try:
+        budget_mb = int(raw_value)
+    except ValueError:
+        print(f"V2 Node: Ignoring invalid CODE_NODES_FRAME_CACHE_MB={raw_value!r}; using {default_mb} MiB.")
+        budget_mb = default_mb
+    return max(0, budget_mb) * 1024 ** 2
+
+
 # --- NEW CLASS NAME ---
 class ImageBatcherByIndexProV2:
     """
@@ -20,6 +146,12 @@ class ImageBatcherByIndexProV2:
     """
 
     MASK_BEHAVIOR_OPTIONS = ["IMAGE_AREA_IS_BLACK", "IMAGE_AREA_IS_WHITE"]
+    # Budget in MiB for cached resized input frames; set CODE_NODES_FRAME_CACHE_MB=0 to disable.
+    PROCESSED_FRAME_CACHE_BYTES = _frame_cache_budget_bytes()
+
+    # Shared across runs so that tweaking only frame_index/max_frames/mask_behavior
+    # skips re-resizing unchanged inputs.
+    _frame_cache = _ProcessedFrameCache(PROCESSED_FRAME_CACHE_BYTES)
 
     @classmethod
     def INPUT_TYPES(s):
@@ -67,6 +199,20 @@ class ImageBatcherByIndexProV2:
             processed_image = current_image_orig[0]
         return processed_image
 
+    def _get_processed_frame(self, img_tensor, frame_idx, target_h, target_w, target_c, dtype, device):
+        image_b1hwc = img_tensor[frame_idx].unsqueeze(0)
+        if tuple(img_tensor.shape[1:]) == (target_h, target_w, target_c):
+            # No resize or channel adaptation needed; the frame is a cheap view.
+            return self._process_single_image(image_b1hwc, target_h, target_w, target_c, dtype, device)
+
+        key = _ProcessedFrameCache.make_key(img_tensor, frame_idx, target_h, target_w, target_c, dtype, device)
+        fingerprint = _ProcessedFrameCache.fingerprint(img_tensor, frame_idx)
+        processed_image = self._frame_cache.get(key, img_tensor, fingerprint)
+        if processed_image is None:
+            processed_image = self._process_single_image(image_b1hwc, target_h, target_w, target_c, dtype, device)
+            self._frame_cache.put(key, img_tensor, processed_image, fingerprint)
+        return processed_image
+
     def create_batch_pro(self, max_frames, **kwargs):
         target_h, target_w, target_c = -1, -1, -1
         first_valid_image_tensor = None
@@ -86,6 +232,8 @@ class ImageBatcherByIndexProV2:
             empty_img = torch.empty(0, 1, 1, 3, dtype=base_dtype, device=base_device)
             return (empty_img, empty_img,)
 
+        self._frame_cache.start_run()
+
         fill_value_rgb_norm = 127.0 / 255.0
         fill_color_tuple = (fill_value_rgb_norm,) * min(target_c, 3)
         white_color_tuple = (1.0,) * min(target_c, 3)
@@ -123,14 +271,12 @@ class ImageBatcherByIndexProV2:
                 for j in range(num_frames_to_take):
                     current_actual_idx = start_idx + j
                     if not (0 <= current_actual_idx < max_frames): break
-                    image_to_process = img_tensor[j].unsqueeze(0)
-                    processed_image = self._process_single_image(image_to_process, target_h, target_w, target_c, base_dtype, base_device)
+                    processed_image = self._get_processed_frame(img_tensor, j, target_h, target_w, target_c, base_dtype, base_device)
                     output_batch[current_actual_idx] = processed_image
                     batch_masks[current_actual_idx] = chosen_mask_frame
             else:
                 print(f"V2 Node: Input image_{i} is a single image. Repeating {repeat_count} times starting at index {frame_index_user}.")
-                image_to_process = img_tensor[0].unsqueeze(0)
-                processed_image = self._process_single_image(image_to_process, target_h, target_w, target_c, base_dtype, base_device)
+                processed_image = self._get_processed_frame(img_tensor, 0, target_h, target_w, target_c, base_dtype, base_device)
 
                 for j in range(repeat_count):
                     current_actual_idx = start_idx + j
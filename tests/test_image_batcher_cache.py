@@ -0,0 +1,143 @@
+import gc
+import os
+import sys
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from image_batcher_by_indexz import ImageBatcherByIndexProV2, _ProcessedFrameCache, _frame_cache_budget_bytes  # noqa: E402
+
+FRAME_BYTES = 8 * 8 * 3 * 4
+
+
+@pytest.fixture
+def cache_bytes():
+    return 64 * 1024 ** 2
+
+
+@pytest.fixture
+def node(monkeypatch, cache_bytes):
+    monkeypatch.setattr(ImageBatcherByIndexProV2, "_frame_cache", _ProcessedFrameCache(cache_bytes))
+    node = ImageBatcherByIndexProV2()
+    calls = []
+    original = node._process_single_image
+
+    def counting_process(*args, **kwargs):
+        calls.append(args)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(node, "_process_single_image", counting_process)
+    node.process_calls = calls
+    return node
+
+
+def _inputs():
+    # image_1 sets the target resolution; image_2 needs resizing to it.
+    return torch.rand(1, 8, 8, 3), torch.rand(4, 4, 4, 3)
+
+
+def test_changing_only_frame_index_hits_cache(node):
+    image_1, image_2 = _inputs()
+    first = node.create_batch_pro(10, image_1=image_1, image_2=image_2, frame_index_2=2, repeat_count_2=4)
+    misses = len(node.process_calls)
+    assert misses == 5
+
+    second = node.create_batch_pro(10, image_1=image_1, image_2=image_2, frame_index_2=5, repeat_count_2=4)
+    assert len(node.process_calls) == misses + 1  # only the unresized image_1 frame
+    assert torch.equal(first[0][1:5], second[0][4:8])
+
+
+def test_inference_mode_inputs(node):
+    with torch.inference_mode():
+        image_1, image_2 = _inputs()
+        first = node.create_batch_pro(6, image_1=image_1, image_2=image_2, repeat_count_2=4)
+        second = node.create_batch_pro(6, image_1=image_1, image_2=image_2, frame_index_2=3, repeat_count_2=4)
+    assert len(node.process_calls) == 6
+    assert torch.equal(first[0][1:5], second[0][2:6])
+
+
+def test_inference_mode_in_place_change_misses_cache(node):
+    with torch.inference_mode():
+        image_1, image_2 = _inputs()
+        first = node.create_batch_pro(6, image_1=image_1, image_2=image_2, repeat_count_2=4)
+        image_2.mul_(0)
+        second = node.create_batch_pro(6, image_1=image_1, image_2=image_2, repeat_count_2=4)
+    assert len(node.process_calls) == 10
+    assert not torch.equal(first[0][1:5], second[0][1:5])
+    assert second[0][1:5].sum() == 0
+
+
+def test_in_place_change_misses_cache(node):
+    image_1, image_2 = _inputs()
+    first = node.create_batch_pro(6, image_1=image_1, image_2=image_2, repeat_count_2=4)
+    image_2.mul_(0.5)
+    second = node.create_batch_pro(6, image_1=image_1, image_2=image_2, repeat_count_2=4)
+    assert len(node.process_calls) == 10
+    assert not torch.equal(first[0][1:5], second[0][1:5])
+
+
+def test_different_input_misses_cache(node):
+    image_1, image_2 = _inputs()
+    node.create_batch_pro(6, image_1=image_1, image_2=image_2, repeat_count_2=4)
+    node.create_batch_pro(6, image_1=image_1, image_2=image_2.clone(), repeat_count_2=4)
+    assert len(node.process_calls) == 10
+
+
+@pytest.mark.parametrize("cache_bytes", [3 * FRAME_BYTES])
+def test_batch_larger_than_budget_keeps_partial_hits(node):
+    image_1, image_2 = torch.rand(1, 8, 8, 3), torch.rand(6, 4, 4, 3)
+    first = node.create_batch_pro(10, image_1=image_1, image_2=image_2, repeat_count_2=6)
+    assert len(node.process_calls) == 7
+    second = node.create_batch_pro(10, image_1=image_1, image_2=image_2, frame_index_2=3, repeat_count_2=6)
+    assert len(node.process_calls) == 7 + 1 + 3
+    assert torch.equal(first[0][1:7], second[0][2:8])
+    assert node._frame_cache.current_bytes <= node._frame_cache.max_bytes
+
+
+def test_eviction_respects_byte_budget():
+    cache = _ProcessedFrameCache(3 * FRAME_BYTES)
+    old_source = torch.rand(10, 4, 4, 3)
+    source = torch.rand(10, 4, 4, 3)
+    cache.start_run()
+    for idx in range(10):
+        cache.put(cache.make_key(old_source, idx, 8, 8, 3, torch.float32, "cpu"), old_source, torch.rand(8, 8, 3))
+        assert cache.current_bytes <= cache.max_bytes
+    # Full within a run: the prefix that fits is kept, later frames are not admitted.
+    assert cache.current_bytes == 3 * FRAME_BYTES
+    assert cache.get(cache.make_key(old_source, 0, 8, 8, 3, torch.float32, "cpu"), old_source) is not None
+    assert cache.get(cache.make_key(old_source, 9, 8, 8, 3, torch.float32, "cpu"), old_source) is None
+
+    # Entries from earlier runs are evicted to make room.
+    cache.start_run()
+    for idx in range(2):
+        cache.put(cache.make_key(source, idx, 8, 8, 3, torch.float32, "cpu"), source, torch.rand(8, 8, 3))
+        assert cache.current_bytes <= cache.max_bytes
+    assert cache.get(cache.make_key(source, 1, 8, 8, 3, torch.float32, "cpu"), source) is not None
+    assert len(cache._entries) == 3
+
+    cache.clear()
+    assert cache.current_bytes == 0
+
+
+@pytest.mark.parametrize("raw_value, expected_mb", [("128", 128), ("abc", 256), ("128.5", 256), ("-5", 0)])
+def test_budget_env_var(monkeypatch, raw_value, expected_mb):
+    monkeypatch.setenv("CODE_NODES_FRAME_CACHE_MB", raw_value)
+    assert _frame_cache_budget_bytes() == expected_mb * 1024 ** 2
+
+
+def test_collected_source_is_purged():
+    cache = _ProcessedFrameCache(64 * 1024 ** 2)
+    kept = torch.rand(1, 4, 4, 3)
+    cache.put(cache.make_key(kept, 0, 8, 8, 3, torch.float32, "cpu"), kept, torch.rand(8, 8, 3))
+    source = torch.rand(2, 4, 4, 3)
+    for idx in range(2):
+        cache.put(cache.make_key(source, idx, 8, 8, 3, torch.float32, "cpu"), source, torch.rand(8, 8, 3))
+    assert cache.current_bytes == 3 * FRAME_BYTES
+
+    del source
+    gc.collect()
+    assert cache.current_bytes == FRAME_BYTES
+    assert len(cache._entries) == 1